@@ -1,6 +1,7 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
+from sqlalchemy import select, literal
+from sqlalchemy.exc import IntegrityError
 from database import engine, Base, get_db
 from models import User
 from schemas import UserCreate, UserLogin, UserResponse, UserUpdate, Token
@@ -16,24 +17,28 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(lifespan=lifespan)
 
+# Presence check without loading a full User row
+async def email_exists(db: AsyncSession, email: str) -> bool:
+    return await db.scalar(select(literal(1)).where(User.email == email).limit(1)) is not None
+
 # 1. Register Route
 @app.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
-    # Check if email exists
-    result = await db.execute(select(User).where(User.email == user.email))
-    if result.scalars().first():
-        raise HTTPException(status_code=400, detail="Email already registered")
-
-    # Create new user
-    hashed_pw = get_password_hash(user.password)
+    # Create new user (unique index on email rejects duplicates)
+    hashed_pw = await get_password_hash(user.password)
     new_user = User(
         email=user.email,
         username=user.username,
         hashed_password=hashed_pw
     )
 
-    db.add(new_user)
-    await db.commit()
+    try:
+        db.add(new_user)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Email already registered")
+
     await db.refresh(new_user)
     return new_user
 
@@ -41,11 +46,10 @@ async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
 @app.post("/login", response_model=Token)
 async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     # Find user
-    result = await db.execute(select(User).where(User.email == user_credentials.email))
-    user = result.scalars().first()
+    user = await db.scalar(select(User).where(User.email == user_credentials.email))
 
     # Validate password
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    if not user or not await verify_password(user_credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -70,8 +74,7 @@ async def update_user_me(
 ):
     # Check for email uniqueness if email is being updated
     if user_update.email and user_update.email != current_user.email:
-        result = await db.execute(select(User).where(User.email == user_update.email))
-        if result.scalars().first():
+        if await email_exists(db, user_update.email):
             raise HTTPException(status_code=400, detail="Email already in use")
         current_user.email = user_update.email
 
@@ -3,6 +3,8 @@ from datetime import datetime
 from typing import Optional
 import re
 
+_HAS_DIGIT = re.compile(r"\d").search
+
 # Base Schema
 class UserBase(BaseModel):
     email: EmailStr
@@ -16,7 +18,7 @@ class UserCreate(UserBase):
     def validate_password(cls, v):
         if len(v) < 8:
             raise ValueError('Password must be at least 8 characters long')
-        if not re.search(r"\d", v):
+        if not _HAS_DIGIT(v):
             raise ValueError('Password must contain at least one number')
         return v
 
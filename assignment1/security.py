@@ -1,10 +1,13 @@
+import time
+import asyncio
 from datetime import datetime, timedelta, UTC
+from functools import lru_cache
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
+from sqlalchemy import select
 from database import get_db
 from models import User
 
@@ -13,25 +16,36 @@ SECRET_KEY = "YOUR_SUPER_SECRET_KEY_HERE" # In production, use .env
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Encode the HMAC key once instead of on every sign/verify
+SIGNING_KEY = SECRET_KEY.encode()
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-# Hash Password
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+# Hash Password (bcrypt is CPU-bound, so run it off the event loop)
+async def get_password_hash(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, pwd_context.hash, password)
 
 # Verify Password
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, pwd_context.verify, plain_password, hashed_password)
 
 # Create JWT Token
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(UTC) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, SIGNING_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Decode JWT Token (memoized: a token's claims never change, so repeat
+# requests with the same token skip signature verification)
+@lru_cache(maxsize=4096)
+def decode_access_token(token: str) -> dict:
+    return jwt.decode(token, SIGNING_KEY, algorithms=[ALGORITHM])
+
 # Dependency: Get Current User (Protects Routes)
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
@@ -40,16 +54,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
-        if email is None:
+        exp = payload.get("exp")
+        # Cached payloads were only checked for expiry on first decode
+        if email is None or exp is None or exp < time.time():
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
     # Database query to find user
-    result = await db.execute(select(User).where(User.email == email))
-    user = result.scalars().first()
+    user = await db.scalar(select(User).where(User.email == email))
 
     if user is None:
         raise credentials_exception
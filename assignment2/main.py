@@ -1,22 +1,41 @@
+import os
 import time
+import heapq
+import asyncio
 import logging
-from typing import Dict, Any, Optional, List
+from collections import OrderedDict, defaultdict, deque
+from functools import partial
+from ipaddress import ip_address
+from typing import Dict, Any, Optional, List, Tuple, Deque, Callable, Awaitable, Union
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request, Response, status
 from fastapi.responses import JSONResponse
 import httpx
+import orjson
 
 # --- Configuration & Constants ---
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 logger = logging.getLogger("WeatherAPI")
+# Per-request cache chatter (HIT/SET/EVICT) is DEBUG; set DEBUG_CACHE=1 to see it
+cache_logger = logging.getLogger("WeatherAPI.cache")
+cache_logger.setLevel(logging.DEBUG if os.getenv("DEBUG_CACHE") else logging.INFO)
 
 OPEN_METEO_GEO_URL = "https://geocoding-api.open-meteo.com/v1/search"
 OPEN_METEO_WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
 CACHE_TTL_SECONDS = 600  # 10 minutes
+CACHE_MAX_SIZE = 1024
+GEO_CACHE_TTL_SECONDS = 86400  # 1 day; coordinates rarely change
+GEO_CACHE_MAX_SIZE = 4096
 RATE_LIMIT_MAX_REQUESTS = 10
 RATE_LIMIT_WINDOW = 60  # 1 minute
+RATE_LIMIT_CLEANUP_INTERVAL = 300  # 5 minutes
 HTTP_TIMEOUT = 5.0  # 5 seconds
+# Keep idle upstream connections around long enough to skip DNS + TLS setup
+HTTP_LIMITS = httpx.Limits(
+    max_connections=1000, max_keepalive_connections=200, keepalive_expiry=60
+)
+HTTP_CONNECT_RETRIES = 1
 
 # --- WMO Weather Code Interpretation ---
 # Derived from Open-Meteo docs
@@ -33,15 +52,32 @@ WMO_CODES = {
     96: "Thunderstorm with slight hail", 99: "Thunderstorm with heavy hail"
 }
 
+# Dense lookup table indexed by code (gaps filled with "Unknown")
+WMO_TABLE = tuple(WMO_CODES.get(code, "Unknown") for code in range(max(WMO_CODES) + 1))
+
 def get_weather_desc(code: int) -> str:
-    return WMO_CODES.get(code, "Unknown")
+    # Open-Meteo may send null (or a float) codes; only plain ints index the table
+    if type(code) is int and 0 <= code < len(WMO_TABLE):
+        return WMO_TABLE[code]
+    return "Unknown"
 
 # --- In-Memory Caching System ---
 class WeatherCache:
-    def __init__(self):
-        self.store: Dict[str, Dict[str, Any]] = {}
+    """LRU cache with per-entry TTL.
+
+    Entries live in an OrderedDict (LRU order) and their expiry times in a
+    min-heap, so expired entries are reaped on write without scanning the store.
+    """
+
+    def __init__(self, maxsize: int = CACHE_MAX_SIZE, ttl: int = CACHE_TTL_SECONDS):
+        self.store: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.expiry_heap: List[Tuple[float, str]] = []
+        self.maxsize = maxsize
+        self.ttl = ttl
         self.hits = 0
         self.misses = 0
+        # Single-flight: one pending fetch per key that concurrent misses await
+        self._inflight: Dict[str, asyncio.Task] = {}
 
     def get(self, key: str) -> Optional[Dict]:
         entry = self.store.get(key)
@@ -50,27 +86,79 @@ class WeatherCache:
             return None
 
         if time.time() > entry['expiry']:
-            logger.info(f"Cache expired for {key}")
+            cache_logger.debug("Cache EXPIRED for %s", key)
             del self.store[key]
             self.misses += 1
             return None
 
+        self.store.move_to_end(key)
         self.hits += 1
-        logger.info(f"Cache HIT for {key}")
+        cache_logger.debug("Cache HIT for %s", key)
         return entry['data']
 
     def set(self, key: str, data: Dict):
+        now = time.time()
+        expiry = now + self.ttl
         self.store[key] = {
             'data': data,
-            'expiry': time.time() + CACHE_TTL_SECONDS
+            'expiry': expiry
         }
-        logger.info(f"Cache SET for {key}")
+        self.store.move_to_end(key)
+        heapq.heappush(self.expiry_heap, (expiry, key))
+        cache_logger.debug("Cache SET for %s", key)
+
+        self._reap_expired(now)
+        while len(self.store) > self.maxsize:
+            evicted, _ = self.store.popitem(last=False)
+            cache_logger.debug("Cache EVICT for %s", evicted)
+
+        # Overwritten/evicted keys leave stale heap records; rebuild once they pile up
+        if len(self.expiry_heap) > 2 * self.maxsize:
+            self.expiry_heap = [(entry['expiry'], k) for k, entry in self.store.items()]
+            heapq.heapify(self.expiry_heap)
+
+    def _reap_expired(self, now: float):
+        heap = self.expiry_heap
+        while heap and heap[0][0] < now:
+            expiry, key = heapq.heappop(heap)
+            entry = self.store.get(key)
+            # Skip heap records superseded by a later set() of the same key
+            if entry and entry['expiry'] == expiry:
+                del self.store[key]
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Returns the cached value, or computes it once for all concurrent callers."""
+        cached = self.get(key)
+        if cached:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            cache_logger.info("Cache MISS for %s", key)
+            task = asyncio.ensure_future(self._compute_and_set(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(partial(self._compute_done, key))
+        # Shield so a cancelled caller (e.g. client disconnect) doesn't cancel the shared fetch
+        return await asyncio.shield(task)
+
+    async def _compute_and_set(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        data = await compute()
+        self.set(key, data)
+        return data
+
+    def _compute_done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark failures as retrieved so a fetch whose callers all left isn't logged
+        if not task.cancelled():
+            task.exception()
 
     def clear(self):
         self.store.clear()
+        self.expiry_heap.clear()
         self.hits = 0
         self.misses = 0
-        logger.info("Cache manually cleared")
+        cache_logger.info("Cache manually cleared")
 
     def get_stats(self):
         return {
@@ -82,16 +170,43 @@ class WeatherCache:
 weather_cache = WeatherCache()
 
 # --- Rate Limiting Storage ---
-# Map: IP -> List[timestamps]
-rate_limit_store: Dict[str, List[float]] = {}
+# Map: IP (as int) -> Deque[timestamps] (oldest first).
+# maxlen caps memory per IP even if cleanup never runs.
+rate_limit_store: Dict[Union[int, str], Deque[float]] = defaultdict(
+    lambda: deque(maxlen=RATE_LIMIT_MAX_REQUESTS + 1)
+)
+
+def rate_limit_key(host: str) -> Union[int, str]:
+    """Keys by the integer form of the IP; non-IP hosts fall back to the string."""
+    try:
+        return int(ip_address(host))
+    except ValueError:
+        return host
+
+def prune_rate_limit_store(now: float):
+    """Drops IPs whose timestamps have all left the window."""
+    cutoff = now - RATE_LIMIT_WINDOW
+    stale = [ip for ip, dq in rate_limit_store.items() if not dq or dq[-1] <= cutoff]
+    for ip in stale:
+        del rate_limit_store[ip]
+
+async def rate_limit_cleanup():
+    while True:
+        await asyncio.sleep(RATE_LIMIT_CLEANUP_INTERVAL)
+        prune_rate_limit_store(time.time())
 
 # --- Lifecycle Manager ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Initialize HTTP Client
-    app.state.client = httpx.AsyncClient(timeout=HTTP_TIMEOUT)
+    # Startup: Initialize HTTP Client and rate-limit cleanup task
+    transport = httpx.AsyncHTTPTransport(
+        http2=True, limits=HTTP_LIMITS, retries=HTTP_CONNECT_RETRIES
+    )
+    app.state.client = httpx.AsyncClient(transport=transport, timeout=HTTP_TIMEOUT)
+    cleanup_task = asyncio.create_task(rate_limit_cleanup())
     yield
-    # Shutdown: Close Client
+    # Shutdown: Stop cleanup and close Client
+    cleanup_task.cancel()
     await app.state.client.aclose()
 
 app = FastAPI(lifespan=lifespan, title="Assignment 2 Weather API")
@@ -102,45 +217,52 @@ async def rate_limiter(request: Request, call_next):
     client_ip = request.client.host
     current_time = time.time()
 
-    # Initialize or clean up old requests
-    if client_ip not in rate_limit_store:
-        rate_limit_store[client_ip] = []
-
-    # Filter out requests older than the window
-    rate_limit_store[client_ip] = [
-        t for t in rate_limit_store[client_ip]
-        if t > current_time - RATE_LIMIT_WINDOW
-    ]
+    # Drop requests older than the window (oldest are at the left)
+    timestamps = rate_limit_store[rate_limit_key(client_ip)]
+    window_start = current_time - RATE_LIMIT_WINDOW
+    while timestamps and timestamps[0] <= window_start:
+        timestamps.popleft()
 
     # Check limit
-    if len(rate_limit_store[client_ip]) >= RATE_LIMIT_MAX_REQUESTS:
-        logger.warning(f"Rate limit exceeded for IP: {client_ip}")
+    if len(timestamps) >= RATE_LIMIT_MAX_REQUESTS:
+        logger.warning("Rate limit exceeded for IP: %s", client_ip)
         return JSONResponse(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             content={"error": "Rate limit exceeded. Max 10 requests per minute."}
         )
 
     # Add current request and proceed
-    rate_limit_store[client_ip].append(current_time)
+    timestamps.append(current_time)
     response = await call_next(request)
     return response
 
 # --- Helper Functions ---
 
+# City name (lowercase) -> geocoding result. Coordinates don't change, so
+# entries live long, but the cache is bounded like the weather cache.
+geo_cache = WeatherCache(maxsize=GEO_CACHE_MAX_SIZE, ttl=GEO_CACHE_TTL_SECONDS)
+
 async def get_coordinates(client: httpx.AsyncClient, city: str):
     """Fetches Lat/Lon for a city name using Open-Meteo Geocoding."""
+    geo_key = city.lower()
+    location = geo_cache.get(geo_key)
+    if location:
+        return location
+
     try:
         response = await client.get(
             OPEN_METEO_GEO_URL,
             params={"name": city, "count": 1, "language": "en", "format": "json"}
         )
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
 
         if not data.get("results"):
             raise HTTPException(status_code=404, detail=f"City '{city}' not found.")
 
-        return data["results"][0]
+        location = data["results"][0]
+        geo_cache.set(geo_key, location)
+        return location
     except httpx.HTTPStatusError as e:
         logger.error(f"Geocoding API error: {str(e)}")
         raise HTTPException(status_code=503, detail="Weather service unavailable")
@@ -148,29 +270,8 @@ async def get_coordinates(client: httpx.AsyncClient, city: str):
         logger.error(f"Network error during geocoding: {str(e)}")
         raise HTTPException(status_code=503, detail="Weather service unavailable")
 
-# --- Endpoints ---
-
-@app.get("/weather/cache-status")
-async def get_cache_status():
-    """Returns statistics about the internal cache."""
-    return weather_cache.get_stats()
-
-@app.delete("/weather/cache")
-async def invalidate_cache():
-    """Manually clears the cache."""
-    weather_cache.clear()
-    return {"message": "Cache invalidated successfully"}
-
-@app.get("/weather/{city}")
-async def get_current_weather(city: str, request: Request):
-    """Fetches current weather for a specific city."""
-    cache_key = f"current_{city.lower()}"
-    cached_data = weather_cache.get(cache_key)
-    if cached_data:
-        return cached_data
-
-    client: httpx.AsyncClient = request.app.state.client
-
+async def fetch_current_weather(client: httpx.AsyncClient, city: str):
+    """Fetches and standardizes current weather from Open-Meteo."""
     # 1. Get Coordinates
     location = await get_coordinates(client, city)
     lat, lon = location["latitude"], location["longitude"]
@@ -186,7 +287,7 @@ async def get_current_weather(city: str, request: Request):
         }
         response = await client.get(OPEN_METEO_WEATHER_URL, params=params)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
 
         current = data["current"]
 
@@ -202,8 +303,6 @@ async def get_current_weather(city: str, request: Request):
             "timestamp": current["time"]
         }
 
-        # 4. Cache and Return
-        weather_cache.set(cache_key, result)
         return result
 
     except httpx.RequestError as exc:
@@ -213,16 +312,8 @@ async def get_current_weather(city: str, request: Request):
         logger.error(f"Unexpected error: {exc}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-@app.get("/weather/forecast/{city}")
-async def get_weather_forecast(city: str, request: Request):
-    """Fetches 5-day weather forecast."""
-    cache_key = f"forecast_{city.lower()}"
-    cached_data = weather_cache.get(cache_key)
-    if cached_data:
-        return cached_data
-
-    client: httpx.AsyncClient = request.app.state.client
-
+async def fetch_weather_forecast(client: httpx.AsyncClient, city: str):
+    """Fetches and standardizes a 5-day forecast from Open-Meteo."""
     # 1. Get Coordinates
     location = await get_coordinates(client, city)
     lat, lon = location["latitude"], location["longitude"]
@@ -238,20 +329,27 @@ async def get_weather_forecast(city: str, request: Request):
         }
         response = await client.get(OPEN_METEO_WEATHER_URL, params=params)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
 
         daily = data["daily"]
-        forecast_list = []
-
-        # Process arrays into list of objects
-        for i in range(len(daily["time"])):
-            forecast_list.append({
-                "date": daily["time"][i],
-                "max_temp": daily["temperature_2m_max"][i],
-                "min_temp": daily["temperature_2m_min"][i],
-                "condition": get_weather_desc(daily["weather_code"][i]),
-                "precipitation_mm": daily["precipitation_sum"][i]
-            })
+
+        # Process column arrays into list of objects
+        forecast_list = [
+            {
+                "date": date,
+                "max_temp": max_temp,
+                "min_temp": min_temp,
+                "condition": get_weather_desc(code),
+                "precipitation_mm": precipitation
+            }
+            for date, max_temp, min_temp, code, precipitation in zip(
+                daily["time"],
+                daily["temperature_2m_max"],
+                daily["temperature_2m_min"],
+                daily["weather_code"],
+                daily["precipitation_sum"]
+            )
+        ]
 
         result = {
             "city": location["name"],
@@ -259,9 +357,37 @@ async def get_weather_forecast(city: str, request: Request):
             "forecast": forecast_list
         }
 
-        weather_cache.set(cache_key, result)
         return result
 
     except httpx.RequestError as exc:
         logger.error(f"External API connection error: {exc}")
         raise HTTPException(status_code=503, detail="Weather service unavailable")
+
+# --- Endpoints ---
+
+@app.get("/weather/cache-status")
+async def get_cache_status():
+    """Returns statistics about the internal cache."""
+    return weather_cache.get_stats()
+
+@app.delete("/weather/cache")
+async def invalidate_cache():
+    """Manually clears the cache."""
+    weather_cache.clear()
+    return {"message": "Cache invalidated successfully"}
+
+@app.get("/weather/{city}")
+async def get_current_weather(city: str, request: Request):
+    """Fetches current weather for a specific city."""
+    client: httpx.AsyncClient = request.app.state.client
+    return await weather_cache.get_or_compute(
+        f"current_{city.lower()}", lambda: fetch_current_weather(client, city)
+    )
+
+@app.get("/weather/forecast/{city}")
+async def get_weather_forecast(city: str, request: Request):
+    """Fetches 5-day weather forecast."""
+    client: httpx.AsyncClient = request.app.state.client
+    return await weather_cache.get_or_compute(
+        f"forecast_{city.lower()}", lambda: fetch_weather_forecast(client, city)
+    )
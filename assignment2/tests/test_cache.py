@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from main import WeatherCache
+
+def test_concurrent_misses_share_one_fetch():
+    cache = WeatherCache()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"city": "London"}
+
+    async def run():
+        return await asyncio.gather(*[cache.get_or_compute("current_london", fetch) for _ in range(50)])
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(r == {"city": "London"} for r in results)
+    assert cache.get("current_london") == {"city": "London"}
+
+def test_fetch_error_reaches_every_waiter():
+    cache = WeatherCache()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(
+            *[cache.get_or_compute("current_london", fetch) for _ in range(5)],
+            return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    # Nothing cached, and the next miss fetches again
+    assert cache.get("current_london") is None
+    assert not cache._inflight
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_or_compute("current_london", fetch))
+    assert calls == 2
+
+def test_cancelled_caller_does_not_fail_waiters():
+    cache = WeatherCache()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return {"city": "London"}
+
+    async def run():
+        first = asyncio.create_task(cache.get_or_compute("current_london", fetch))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_compute("current_london", fetch))
+        await asyncio.sleep(0.01)
+        # e.g. the first client disconnected
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == {"city": "London"}
+    assert cache.get("current_london") == {"city": "London"}
+
+def test_lru_evicts_least_recently_used():
+    cache = WeatherCache(maxsize=2)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    cache.get("a")
+    cache.set("c", {"v": 3})
+    assert list(cache.store) == ["a", "c"]
+
+def test_expiry_heap_stays_bounded():
+    cache = WeatherCache(maxsize=4)
+    for i in range(10000):
+        cache.set("current_london", {"v": i})
+    for i in range(1000):
+        cache.set(f"city_{i}", {"v": i})
+    assert len(cache.store) == 4
+    assert len(cache.expiry_heap) <= 2 * cache.maxsize
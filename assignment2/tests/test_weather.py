@@ -0,0 +1,11 @@
+from main import get_weather_desc
+
+def test_weather_desc_known_code():
+    assert get_weather_desc(3) == "Overcast"
+
+def test_weather_desc_unknown_or_missing_code():
+    assert get_weather_desc(4) == "Unknown"
+    assert get_weather_desc(-1) == "Unknown"
+    assert get_weather_desc(100) == "Unknown"
+    assert get_weather_desc(None) == "Unknown"
+    assert get_weather_desc(3.0) == "Unknown"
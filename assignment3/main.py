@@ -1,37 +1,52 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select, literal, func
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.responses import Response
+from pydantic import TypeAdapter
 from typing import List, Optional
+from contextlib import asynccontextmanager
 import models, schemas, database, auth
 
-# Create Tables
-models.Base.metadata.create_all(bind=database.engine)
+# Create tables on startup
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with database.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    yield
 
-app = FastAPI(title="Blog API Assignment")
+app = FastAPI(title="Blog API Assignment", lifespan=lifespan)
+
+# Validates and serializes post lists in one pass (skips FastAPI's response_model handling)
+_post_list_adapter = TypeAdapter(List[schemas.PostResponse])
 
 # --- Auth Endpoints ---
 @app.post("/register", response_model=schemas.UserResponse)
-def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(database.get_db)):
+    # Insert optimistically; unique indexes on username/email reject duplicates
     try:
-        hashed_pwd = auth.get_password_hash(user.password)
+        hashed_pwd = await auth.get_password_hash(user.password)
         new_user = models.User(username=user.username, email=user.email, hashed_password=hashed_pwd)
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         return new_user
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
+        # Only on the failure path: find out which constraint was hit
+        username_taken = await db.scalar(
+            select(literal(1)).where(models.User.username == user.username).limit(1)
+        )
+        if username_taken:
+            raise HTTPException(status_code=400, detail="Username already registered")
         raise HTTPException(status_code=400, detail="Email already registered")
 
 @app.post("/token", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_db)):
+    user = await db.scalar(select(models.User).where(models.User.username == form_data.username))
+    if not user or not await auth.verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
     access_token = auth.create_access_token(data={"sub": user.username})
@@ -39,45 +54,66 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 # --- Post Endpoints ---
 @app.post("/posts", response_model=schemas.PostResponse, status_code=201)
-def create_post(
+async def create_post(
     post: schemas.PostCreate,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     new_post = models.Post(**post.model_dump(), author_id=current_user.id)
     db.add(new_post)
-    db.commit()
-    db.refresh(new_post)
+    await db.commit()
+    await db.refresh(new_post)
     return new_post
 
-@app.get("/posts", response_model=List[schemas.PostResponse])
-def get_posts(
+@app.get(
+    "/posts",
+    response_model=None,
+    responses={200: {"model": List[schemas.PostResponse]}},
+)
+async def get_posts(
     skip: int = 0,
     limit: int = 10,
     search: Optional[str] = None,
-    db: Session = Depends(database.get_db)
+    after_id: Optional[int] = None,
+    db: AsyncSession = Depends(database.get_db)
 ):
-    query = db.query(models.Post)
+    if after_id is not None and skip:
+        raise HTTPException(status_code=400, detail="Use either skip or after_id, not both")
+
+    query = select(models.Post)
     if search:
         # Use ilike for case-insensitive search
-        query = query.filter(models.Post.title.ilike(f"%{search}%"))
-    return query.offset(skip).limit(limit).all()
+        query = query.where(models.Post.title.ilike(f"%{search}%"))
+    # Oldest first; keyset pagination seeks past the last seen id instead of scanning with OFFSET
+    query = query.order_by(models.Post.id)
+    if after_id is not None:
+        query = query.where(models.Post.id > after_id)
+    elif skip:
+        query = query.offset(skip)
+    rows = (await db.scalars(query.limit(limit))).all()
+    posts = _post_list_adapter.validate_python(rows, from_attributes=True)
+    return Response(_post_list_adapter.dump_json(posts), media_type="application/json")
 
 @app.get("/posts/{post_id}", response_model=schemas.PostWithComments)
-def get_post(post_id: int, db: Session = Depends(database.get_db)):
-    post = db.query(models.Post).filter(models.Post.id == post_id).first()
+async def get_post(post_id: int, db: AsyncSession = Depends(database.get_db)):
+    # Eager-load comments in one batched query instead of a lazy load on serialization
+    post = await db.scalar(
+        select(models.Post)
+        .options(selectinload(models.Post.comments))
+        .where(models.Post.id == post_id)
+    )
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     return post
 
 @app.put("/posts/{post_id}", response_model=schemas.PostResponse)
-def update_post(
+async def update_post(
     post_id: int,
     post_update: schemas.PostUpdate,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
+    db_post = await db.scalar(select(models.Post).where(models.Post.id == post_id))
     if not db_post:
         raise HTTPException(status_code=404, detail="Post not found")
     if db_post.author_id != current_user.id:
@@ -88,35 +124,35 @@ def update_post(
     if post_update.content:
         db_post.content = post_update.content
 
-    db.commit()
-    db.refresh(db_post)
+    await db.commit()
+    await db.refresh(db_post)
     return db_post
 
 @app.delete("/posts/{post_id}", status_code=204)
-def delete_post(
+async def delete_post(
     post_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
+    db_post = await db.scalar(select(models.Post).where(models.Post.id == post_id))
     if not db_post:
         raise HTTPException(status_code=404, detail="Post not found")
     if db_post.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this post")
 
-    db.delete(db_post)
-    db.commit()
+    await db.delete(db_post)
+    await db.commit()
     return None
 
 # --- Comment Endpoints ---
 @app.post("/posts/{post_id}/comments", response_model=schemas.CommentResponse)
-def create_comment(
+async def create_comment(
     post_id: int,
     comment: schemas.CommentCreate,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    post = db.query(models.Post).filter(models.Post.id == post_id).first()
+    post = await db.scalar(select(models.Post).where(models.Post.id == post_id))
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
@@ -126,27 +162,37 @@ def create_comment(
         author_id=current_user.id
     )
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
+    await db.commit()
+    await db.refresh(new_comment)
     return new_comment
 
 @app.get("/posts/{post_id}/comments", response_model=List[schemas.CommentResponse])
-def get_comments(post_id: int, db: Session = Depends(database.get_db)):
-    comments = db.query(models.Comment).filter(models.Comment.post_id == post_id).all()
+async def get_comments(post_id: int, db: AsyncSession = Depends(database.get_db)):
+    comments = (await db.scalars(
+        select(models.Comment).where(models.Comment.post_id == post_id)
+    )).all()
     return comments
 
+@app.get("/posts/{post_id}/comments/count", response_model=schemas.CommentCount)
+async def count_comments(post_id: int, db: AsyncSession = Depends(database.get_db)):
+    # COUNT(*) on the post_id index instead of loading every comment
+    count = await db.scalar(
+        select(func.count()).select_from(models.Comment).where(models.Comment.post_id == post_id)
+    )
+    return {"count": count}
+
 @app.delete("/comments/{comment_id}", status_code=204)
-def delete_comment(
+async def delete_comment(
     comment_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    comment = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
+    comment = await db.scalar(select(models.Comment).where(models.Comment.id == comment_id))
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     if comment.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
 
-    db.delete(comment)
-    db.commit()
+    await db.delete(comment)
+    await db.commit()
     return None
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index, DDL, event
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from database import Base
@@ -29,12 +29,27 @@ class Post(Base):
     # cascade="all, delete-orphan" ensures comments are deleted when post is deleted
     comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
 
+# Trigram index so ILIKE '%term%' search can use an index (PostgreSQL only,
+# requires the pg_trgm extension, created below); other dialects skip it.
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+Index(
+    "ix_posts_title_trgm",
+    Post.title,
+    postgresql_using="gin",
+    postgresql_ops={"title": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
 class Comment(Base):
     __tablename__ = "comments"
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(String)
-    post_id = Column(Integer, ForeignKey("posts.id"))
+    post_id = Column(Integer, ForeignKey("posts.id"), index=True)
     author_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
@@ -28,6 +28,9 @@ class CommentResponse(BaseModel):
     post_id: int
     created_at: datetime
 
+class CommentCount(BaseModel):
+    count: int
+
 # --- Post Schemas ---
 class PostCreate(BaseModel):
     title: str
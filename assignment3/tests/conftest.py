@@ -1,46 +1,49 @@
+import os
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy import select
+
+# Point the app's engine at in-memory SQLite before main/database are imported,
+# so lifespan DDL and every request hit the test database, not ./blog.db
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///:memory:"
+
 from fastapi.testclient import TestClient
 from main import app
-from database import Base, get_db
+from database import Base, engine, SessionLocal as TestingSessionLocal
 from auth import create_access_token
+from models import Post, User
+
+async def _drop_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
 
-# Use in-memory SQLite for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+async def _clear_tables():
+    async with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            await conn.execute(table.delete())
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+@pytest.fixture(scope="session")
+def app_client():
+    """One TestClient for the whole run; its lifespan creates the schema once."""
+    with TestClient(app) as c:
+        yield c
+        c.portal.call(_drop_tables)
 
 @pytest.fixture(scope="function")
-def db_session():
-    """Create a fresh database session for each test."""
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-        Base.metadata.drop_all(bind=engine)
+def client(app_client):
+    """The shared test client, emptying tables after each test."""
+    yield app_client
+    app_client.portal.call(_clear_tables)
 
 @pytest.fixture(scope="function")
-def client(db_session):
-    """Override the get_db dependency with the testing session."""
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            db_session.close()
-
-    app.dependency_overrides[get_db] = override_get_db
-    with TestClient(app) as c:
-        yield c
-    app.dependency_overrides.clear()
+def run_db(client):
+    """Run `fn(session)` against the test database on the app's event loop."""
+    def _run_db(fn):
+        async def _call():
+            async with TestingSessionLocal() as db:
+                return await fn(db)
+        return client.portal.call(_call)
+    return _run_db
 
 @pytest.fixture
 def auth_headers(client):
@@ -57,3 +60,21 @@ def auth_headers_user2(client):
     response = client.post("/token", data={"username": "user2", "password": "password123"})
     token = response.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def make_posts(run_db):
+    """Bulk-insert posts for a user in a single transaction."""
+    def _make_posts(user_id, n):
+        async def _insert(db):
+            db.add_all([
+                Post(title=f"Post {i}", content="Content", author_id=user_id)
+                for i in range(n)
+            ])
+            await db.commit()
+        run_db(_insert)
+    return _make_posts
+
+@pytest.fixture
+def test_user_id(auth_headers, run_db):
+    """Id of the user behind auth_headers."""
+    return run_db(lambda db: db.scalar(select(User.id).where(User.username == "testuser")))
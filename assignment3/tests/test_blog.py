@@ -31,14 +31,9 @@ def test_update_forbidden(client, auth_headers, auth_headers_user2):
     )
     assert update_res.status_code == 403
 
-def test_get_posts_pagination(client, auth_headers):
+def test_get_posts_pagination(client, test_user_id, make_posts):
     # Create 15 posts
-    for i in range(15):
-        client.post(
-            "/posts",
-            json={"title": f"Post {i}", "content": "Content"},
-            headers=auth_headers
-        )
+    make_posts(test_user_id, 15)
 
     # Get first 10
     response = client.get("/posts?skip=0&limit=10")
@@ -50,6 +45,24 @@ def test_get_posts_pagination(client, auth_headers):
     data = response.json()
     assert len(data) == 5
 
+def test_get_posts_keyset_pagination(client, test_user_id, make_posts):
+    make_posts(test_user_id, 15)
+
+    # Oldest first, same order as skip/limit paging
+    first_page = client.get("/posts?limit=10").json()
+    assert len(first_page) == 10
+    assert first_page[0]["title"] == "Post 0"
+
+    # Continue after the last id seen
+    last_id = first_page[-1]["id"]
+    second_page = client.get(f"/posts?after_id={last_id}&limit=10").json()
+    assert len(second_page) == 5
+    assert [p["title"] for p in second_page] == [f"Post {i}" for i in range(10, 15)]
+
+def test_get_posts_skip_with_after_id_rejected(client):
+    response = client.get("/posts?skip=5&after_id=1")
+    assert response.status_code == 400
+
 def test_database_rollback_on_constraint_violation(client, auth_headers):
     # 1. Register a user successfully
     client.post("/register", json={"username": "user_A", "email": "shared@email.com", "password": "pwd"})
@@ -76,6 +89,15 @@ def test_database_rollback_on_constraint_violation(client, auth_headers):
     )
     assert response_retry.status_code == 200
 
+def test_register_duplicate_username(client):
+    client.post("/register", json={"username": "dup", "email": "dup1@email.com", "password": "pwd"})
+    response = client.post(
+        "/register",
+        json={"username": "dup", "email": "dup2@email.com", "password": "pwd"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Username already registered"
+
 def test_comment_creation_retrieval(client, auth_headers):
     # Create Post
     post_res = client.post(
@@ -98,7 +120,12 @@ def test_comment_creation_retrieval(client, auth_headers):
     get_res = client.get(f"/posts/{post_id}/comments")
     assert len(get_res.json()) == 1
 
-def test_cascading_delete(client, auth_headers, db_session):
+    # Count Comments
+    count_res = client.get(f"/posts/{post_id}/comments/count")
+    assert count_res.status_code == 200
+    assert count_res.json() == {"count": 1}
+
+def test_cascading_delete(client, auth_headers, run_db):
     # Create Post and Comment
     post_res = client.post("/posts", json={"title": "P", "content": "C"}, headers=auth_headers)
     post_id = post_res.json()["id"]
@@ -106,7 +133,7 @@ def test_cascading_delete(client, auth_headers, db_session):
     client.post(f"/posts/{post_id}/comments", json={"text": "Comment"}, headers=auth_headers)
 
     # Verify comment exists
-    assert len(client.get(f"/posts/{post_id}/comments").json()) == 1
+    assert client.get(f"/posts/{post_id}/comments/count").json()["count"] == 1
 
     # Delete Post
     client.delete(f"/posts/{post_id}", headers=auth_headers)
@@ -119,8 +146,11 @@ def test_cascading_delete(client, auth_headers, db_session):
     # Our impl returns 404 for post first.
 
     # Let's check DB directly to be sure about Cascade
+    from sqlalchemy import func, select
     from models import Comment
-    count = db_session.query(Comment).filter(Comment.post_id == post_id).count()
+    count = run_db(lambda db: db.scalar(
+        select(func.count()).select_from(Comment).where(Comment.post_id == post_id)
+    ))
     assert count == 0
 
 def test_delete_comment_forbidden(client, auth_headers, auth_headers_user2):
@@ -136,8 +166,8 @@ def test_delete_comment_forbidden(client, auth_headers, auth_headers_user2):
     assert del_res.status_code == 403
 
     # Verify comment still exists
-    get_res = client.get(f"/posts/{post_id}/comments")
-    assert len(get_res.json()) == 1
+    count_res = client.get(f"/posts/{post_id}/comments/count")
+    assert count_res.json()["count"] == 1
 
 def test_search_posts(client, auth_headers):
     # Create posts: "FastAPI Guide" and "Python Basics"